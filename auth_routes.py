@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException
 from models import Usuario
 from dependencies import pegar_sessao, verificar_token
-from main import bcrypt_context, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY
+from main import argon2_hasher, hash_executor, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY
 from schemas import UsuarioSchema, LoginSchema
-from sqlalchemy.orm import Session
-from jose import jwt, JWTError
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+import jwt
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm
+import bcrypt
+from argon2.exceptions import VerificationError, InvalidHashError
+import asyncio
+import hmac
+from cachetools import TTLCache
 
-def criar_token(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
-    data_expiracao = datetime.now(timezone.utc) + duracao_token
+def criar_token(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES), agora=None):
+    agora = agora or datetime.now(timezone.utc)
+    data_expiracao = agora + duracao_token
     dic_info = {
         "sub": str(id_usuario),
         "exp": data_expiracao
@@ -18,12 +26,53 @@ def criar_token(id_usuario, duracao_token=timedelta(minutes=ACCESS_TOKEN_EXPIRE_
     return jwt_codificado
     
 
-def autenticar_usuario(email, senha, session):
-    usuario = session.query(Usuario).filter(Usuario.email==email).first()
+def hash_legado(senha_criptografada):
+    # Hashes bcrypt ($2a$/$2b$/$2y$) de antes da migração para Argon2id
+    return senha_criptografada.startswith("$2")
+
+def comparar_senha(senha, senha_criptografada):
+    if hash_legado(senha_criptografada):
+        return bcrypt.checkpw(senha.encode(), senha_criptografada.encode())
+    try:
+        return argon2_hasher.verify(senha_criptografada, senha)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def precisa_atualizar_hash(senha_criptografada):
+    return hash_legado(senha_criptografada) or argon2_hasher.check_needs_rehash(senha_criptografada)
+
+async def criptografar_senha(senha):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, argon2_hasher.hash, senha)
+
+async def verificar_senha(senha, senha_criptografada):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(hash_executor, comparar_senha, senha, senha_criptografada)
+
+# Logins bem-sucedidos recentes (só positivos, por 60s) para pular o hash em logins repetidos.
+# A chave inclui o hash salvo, então trocar a senha invalida a entrada.
+logins_verificados = TTLCache(maxsize=4096, ttl=60)
+
+def chave_login(email, senha, senha_criptografada):
+    return hmac.new(SECRET_KEY.encode(), f"{email}|{senha}|{senha_criptografada}".encode(), "sha256").hexdigest()
+
+async def autenticar_usuario(email, senha, session):
+    # Busca só as colunas usadas no login; retorna uma linha leve com id e senha
+    resultado = await session.execute(select(Usuario.id, Usuario.senha).where(Usuario.email==email))
+    usuario = resultado.first()
     if not usuario:
         return False
-    elif not bcrypt_context.verify(senha, usuario.senha):
+    if chave_login(email, senha, usuario.senha) in logins_verificados:
+        return usuario
+    elif not await verificar_senha(senha, usuario.senha):
         return False
+    senha_criptografada = usuario.senha
+    if precisa_atualizar_hash(senha_criptografada):
+        # Migra hashes bcrypt (ou Argon2 com parâmetros antigos) no primeiro login válido
+        senha_criptografada = await criptografar_senha(senha)
+        await session.execute(update(Usuario).where(Usuario.id==usuario.id).values(senha=senha_criptografada))
+        await session.commit()
+    logins_verificados[chave_login(email, senha, senha_criptografada)] = True
     return usuario
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
@@ -42,12 +91,12 @@ async def home():
     return {"mensagem": "Você acessou a rota de autenticação", "autenticado": False}
 
 @auth_router.post("/criar-conta")
-async def criar_conta(usuario_schema:UsuarioSchema, session: Session = Depends(pegar_sessao)):
+async def criar_conta(usuario_schema:UsuarioSchema, session: AsyncSession = Depends(pegar_sessao)):
     """
     Cadastrar novo usuário no sistema
     
     Cria uma nova conta de usuário no sistema. O email deve ser único e a senha
-    será automaticamente criptografada usando bcrypt antes de ser armazenada.
+    será automaticamente criptografada usando Argon2id antes de ser armazenada.
     
     Args:
         usuario_schema (UsuarioSchema): Dados do usuário a ser cadastrado
@@ -63,19 +112,25 @@ async def criar_conta(usuario_schema:UsuarioSchema, session: Session = Depends(p
     Raises:
         HTTPException: 400 - Email já cadastrado no sistema
     """
-    usuario = session.query(Usuario).filter(Usuario.email==usuario_schema.email).first()
+    resultado = await session.execute(select(Usuario).where(Usuario.email==usuario_schema.email))
+    usuario = resultado.scalar_one_or_none()
 
     if usuario:
         raise HTTPException(status_code=400, detail="Email Já Cadastrado!")
     else:
-        senha_criptografada = bcrypt_context.hash(usuario_schema.senha)
+        senha_criptografada = await criptografar_senha(usuario_schema.senha)
         novo_usuario = Usuario(usuario_schema.nome, usuario_schema.email, senha_criptografada, usuario_schema.ativo, usuario_schema.admin)
         session.add(novo_usuario)
-        session.commit()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Outro cadastro com o mesmo email foi gravado depois da verificação acima
+            await session.rollback()
+            raise HTTPException(status_code=400, detail="Email Já Cadastrado!")
         return {"message": f"Email {usuario_schema.email} Cadastrado Com Sucesso!"}
     
 @auth_router.post("/login")
-async def login(login_schema: LoginSchema, session: Session = Depends(pegar_sessao)):
+async def login(login_schema: LoginSchema, session: AsyncSession = Depends(pegar_sessao)):
     """
     Autenticar usuário e gerar tokens JWT
     
@@ -96,13 +151,14 @@ async def login(login_schema: LoginSchema, session: Session = Depends(pegar_sess
     Raises:
         HTTPException: 400 - Credenciais inválidas ou usuário não encontrado
     """
-    usuario = autenticar_usuario(login_schema.email, login_schema.senha, session)
+    usuario = await autenticar_usuario(login_schema.email, login_schema.senha, session)
     
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário Não Encontrado ou Credenciais Inválidas!")
     else:
-        access_token = criar_token(usuario.id)
-        refresh_token = criar_token(usuario.id, duracao_token=timedelta(days=7))
+        agora = datetime.now(timezone.utc)
+        access_token = criar_token(usuario.id, agora=agora)
+        refresh_token = criar_token(usuario.id, duracao_token=timedelta(days=7), agora=agora)
         return {
             "access_token": access_token,
             "refresh_token": refresh_token,
@@ -110,7 +166,7 @@ async def login(login_schema: LoginSchema, session: Session = Depends(pegar_sess
             }
     
 @auth_router.post("/login-form")
-async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(pegar_sessao)):
+async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(pegar_sessao)):
     """
     Login via formulário OAuth2 (compatível com Swagger UI)
     
@@ -134,7 +190,7 @@ async def login_form(dados_formulario: OAuth2PasswordRequestForm = Depends(), se
     Note:
         Este endpoint é usado pelo Swagger UI para autenticação automática
     """
-    usuario = autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
+    usuario = await autenticar_usuario(dados_formulario.username, dados_formulario.password, session)
     
     if not usuario:
         raise HTTPException(status_code=400, detail="Usuário Não Encontrado ou Credenciais Inválidas!")
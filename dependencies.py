@@ -1,25 +1,34 @@
 from fastapi import Depends, HTTPException
 from main import SECRET_KEY, ALGORITHM, oauth2_schema
-from models import db
-from sqlalchemy.orm import sessionmaker, Session
+from models import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Usuario
-from jose import jwt, JWTError
+import jwt
+import time
+from functools import lru_cache
 
-def pegar_sessao():
+async def pegar_sessao():
+    session = SessionLocal()
     try:
-        Session = sessionmaker(bind=db)
-        session = Session()
         yield session
     finally:
-        session.close()
+        await SessionLocal.remove()
 
-def verificar_token(token: str = Depends(oauth2_schema), session: Session = Depends(pegar_sessao)):
+# Guarda o resultado da validação do token para que requisições repetidas com o mesmo
+# token não refaçam a verificação da assinatura; a expiração é checada a cada uso
+@lru_cache(maxsize=8192)
+def decodificar_token(token):
+    dic_info = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return int(dic_info.get("sub")), dic_info.get("exp")
+
+async def verificar_token(token: str = Depends(oauth2_schema), session: AsyncSession = Depends(pegar_sessao)):
     try:
-        dic_info = jwt.decode(token, SECRET_KEY, ALGORITHM)
-        id_usuario = int(dic_info.get("sub"))
-    except JWTError:
+        id_usuario, data_expiracao = decodificar_token(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Acesso Negado, Verifique a Validade do Token")
+    if data_expiracao is not None and data_expiracao <= time.time():
         raise HTTPException(status_code=401, detail="Acesso Negado, Verifique a Validade do Token")
-    usuario = session.query(Usuario).filter(Usuario.id==id_usuario).first()
+    usuario = await session.get(Usuario, id_usuario)
     if not usuario:
         raise HTTPException(status_code=401, detail="Acesso Inválido")
     return usuario
\ No newline at end of file
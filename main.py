@@ -1,7 +1,10 @@
 from fastapi import FastAPI
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
+from argon2 import PasswordHasher
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import count
 import os
 
 
@@ -10,15 +13,46 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# Custo do Argon2id (padrões do argon2-cffi em produção; testes/CI podem reduzir para hashes mais rápidos)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
 
-app = FastAPI()
+from models import db, id_requisicao
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Fecha as conexões do pool: cada conexão aiosqlite mantém uma thread que impediria o processo de encerrar
+    await db.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_schema = OAuth2PasswordBearer(tokenUrl="auth/login-form")
+argon2_hasher = PasswordHasher(time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST)
+# Pool compartilhado para o hash/verificação das senhas, que é CPU-bound e bloquearia o event loop
+hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
 
 from auth_routes import auth_router
 from order_routes import order_router
 
+class EscopoSessaoMiddleware:
+    # Middleware ASGI puro: só define o escopo da sessão do banco para a requisição,
+    # sem a task e o stream de resposta extras do @app.middleware("http")
+    def __init__(self, app):
+        self.app = app
+        self.contador = count()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = id_requisicao.set(next(self.contador))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            id_requisicao.reset(token)
+
+app.add_middleware(EscopoSessaoMiddleware)
+
 app.include_router(auth_router)
 app.include_router(order_router)
 
@@ -1,12 +1,49 @@
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, Float, ForeignKey
+from sqlalchemy import event, Column, String, Integer, Boolean, Float, ForeignKey, Index
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, async_scoped_session, AsyncAttrs
 from sqlalchemy_utils import ChoiceType
+from contextvars import ContextVar
+import os
 
-# Cria a conexão com o banco de dados
-db = create_engine("sqlite:///banco.db")
+DB_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///banco.db")
+
+BANCO_SQLITE = DB_URL.startswith("sqlite")
+
+# Cria a conexão assíncrona com o banco de dados (pool compartilhado entre as requisições).
+# O pre-ping só vale para bancos em servidor: um arquivo SQLite local não tem conexão que fique obsoleta
+db = create_async_engine(
+    DB_URL,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=not BANCO_SQLITE,
+    pool_recycle=3600
+)
+
+# No SQLite, usa WAL com synchronous=NORMAL: um fsync por commit e leituras sem bloquear escritas
+if BANCO_SQLITE:
+    @event.listens_for(db.sync_engine, "connect")
+    def configurar_sqlite(conexao, registro_conexao):
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+
+# Identificador da requisição atual, definido por um middleware em main.py. Sem valor padrão:
+# fora do middleware a sessão falha com LookupError em vez de ser compartilhada entre requisições
+id_requisicao = ContextVar("id_requisicao")
+
+# Registro de sessões com escopo por requisição: todas as dependências da mesma
+# requisição recebem a mesma sessão
+SessionLocal = async_scoped_session(
+    async_sessionmaker(bind=db, expire_on_commit=False),
+    scopefunc=id_requisicao.get
+)
 
 # Cria a base do banco de dados
-Base =declarative_base()
+Base = declarative_base(cls=AsyncAttrs)
 
 # Cria as classes/tabelas do banco de dados
 class Usuario(Base):
@@ -14,7 +51,7 @@ class Usuario(Base):
 
     id = Column("id", Integer, primary_key=True, autoincrement=True)
     nome = Column("Nome",  String)
-    email = Column("email", String, nullable=False)
+    email = Column("email", String, nullable=False, unique=True, index=True)
     senha = Column("senha", String)
     ativo = Column("ativo", Boolean)
     admin = Column("admin", Boolean, default=False)
@@ -41,18 +78,13 @@ class Pedido(Base):
     preco = Column("preco", Float)
     itens = relationship("ItemPedido", cascade="all, delete")
 
+    __table_args__ = (Index("ix_pedidos_usuario_status", "usuario", "status"),)
+
     def __init__(self, usuario, status="PENDENTE", preco=0):
         self.usuario = usuario
         self.preco = preco
         self.status = status
 
-    def calcular_preco(self):
-        # preco_pedido = 0
-        # for item in self.itens:
-        #     preco_item = item.preco * item.quantidade
-        #     preco_pedido += preco_item
-        self.preco = sum(item.preco_unitario * item.quantidade for item in self.itens)
-
 class ItemPedido(Base):
     __tablename__ = "itens_pedido"
 
@@ -1,12 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from dependencies import pegar_sessao, verificar_token
-from schemas import PedidoSchema, ItemPedidoSchema, ResponsePedidoSchema
+from schemas import PedidoSchema, ItemPedidoSchema, ResponsePedidoSchema, PedidoResumoSchema, ResponsePedidoDetalhadoSchema
 from models import Pedido, Usuario, ItemPedido
 from typing import List
 
 order_router = APIRouter(prefix="/pedidos", tags=["pedidos"], dependencies=[Depends(verificar_token)])
 
+async def somar_preco_pedido(session, pedido, valor):
+    # Soma no próprio UPDATE para que requisições simultâneas não sobrescrevam o total umas das outras
+    resultado = await session.execute(
+        update(Pedido)
+        .where(Pedido.id==pedido.id)
+        .values(preco=func.coalesce(Pedido.preco, 0) + valor)
+        .returning(Pedido.preco)
+        .execution_options(synchronize_session=False)
+    )
+    set_committed_value(pedido, "preco", float(resultado.scalar_one()))
+
 @order_router.get("/")
 async def pedidos():
     """
@@ -24,7 +38,7 @@ async def pedidos():
     return {"mensagem": "Você acessou a rota de pedidos"}
 
 @order_router.post("/criar-pedido")
-async def criar_pedido(pedido_schema: PedidoSchema, session: Session = Depends(pegar_sessao)):
+async def criar_pedido(pedido_schema: PedidoSchema, session: AsyncSession = Depends(pegar_sessao)):
     """
     Criar novo pedido no sistema
     
@@ -48,11 +62,11 @@ async def criar_pedido(pedido_schema: PedidoSchema, session: Session = Depends(p
     """
     novo_pedido = Pedido(usuario=pedido_schema.usuario)
     session.add(novo_pedido)
-    session.commit()
+    await session.commit()
     return {"mensagem": f"Pedido Criado Com Sucesso. ID do Pedido: {novo_pedido.id}"}
 
 @order_router.post("/cancelar/{id_pedido}")
-async def cancelar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def cancelar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Cancelar pedido existente
     
@@ -76,20 +90,20 @@ async def cancelar_pedido(id_pedido: int, session: Session = Depends(pegar_sessa
         Requer token JWT válido no header Authorization
         Apenas o dono do pedido ou administradores podem cancelar
     """
-    pedido = session.query(Pedido).filter(Pedido.id==id_pedido).first()
+    pedido = await session.get(Pedido, id_pedido)
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido Não Encontrado")
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
     pedido.status = "CANCELADO"
-    session.commit()
+    await session.commit()
     return {
         "mensagem": f"Pedido Número: {id_pedido} Cancelado Com Sucesso", 
-        "pedido": pedido
+        "pedido": PedidoResumoSchema.model_validate(pedido)
     }
 
 @order_router.get("/listar")
-async def listar_pedidos(session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def listar_pedidos(session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Listar todos os pedidos do sistema (apenas administradores)
     
@@ -113,13 +127,14 @@ async def listar_pedidos(session: Session = Depends(pegar_sessao), usuario: Usua
     if not usuario.admin:
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
     else:
-        pedidos = session.query(Pedido).all()
+        resultado = await session.execute(select(Pedido).options(selectinload(Pedido.itens)))
+        pedidos = resultado.scalars().all()
         return {
-            "pedidos": pedidos
+            "pedidos": [ResponsePedidoDetalhadoSchema.model_validate(pedido) for pedido in pedidos]
         }
     
 @order_router.post("/adicionar-item/{id_pedido}")
-async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSchema, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSchema, session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Adicionar item (pizza) a um pedido existente
     
@@ -149,7 +164,7 @@ async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSc
         Requer token JWT válido no header Authorization
         Apenas o dono do pedido ou administradores podem adicionar itens
     """
-    pedido = session.query(Pedido).filter(Pedido.id==id_pedido).first()
+    pedido = await session.get(Pedido, id_pedido)
 
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido Não Existe")
@@ -157,8 +172,8 @@ async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSc
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
     item_pedido = ItemPedido(item_pedido_schema.quantidade, item_pedido_schema.sabor, item_pedido_schema.tamanho, item_pedido_schema.preco_unitario, id_pedido)
     session.add(item_pedido)
-    pedido.calcular_preco()
-    session.commit()
+    await somar_preco_pedido(session, pedido, item_pedido_schema.quantidade * item_pedido_schema.preco_unitario)
+    await session.commit()
     return {
         "mensagem": "Item Criado Com Sucesso",
         "item_id": item_pedido.id,
@@ -166,7 +181,7 @@ async def adicionar_item_pedido(id_pedido: int, item_pedido_schema: ItemPedidoSc
     }
 
 @order_router.post("/remover-item/{id_item_pedido}")
-async def remover_item_pedido(id_item_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def remover_item_pedido(id_item_pedido: int, session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Remover item específico de um pedido
     
@@ -191,23 +206,30 @@ async def remover_item_pedido(id_item_pedido: int, session: Session = Depends(pe
         Requer token JWT válido no header Authorization
         Apenas o dono do pedido ou administradores podem remover itens
     """
-    item_pedido = session.query(ItemPedido).filter(ItemPedido.id==id_item_pedido).first()
-    pedido = session.query(Pedido).filter(Pedido.id==id_item_pedido).first()
+    item_pedido = await session.get(ItemPedido, id_item_pedido)
     if not item_pedido:
         raise HTTPException(status_code=400, detail="Item do Pedido Não Existe")
+    # Trava o pedido até o commit para que adições simultâneas não se percam na recontagem
+    pedido = await session.get(Pedido, item_pedido.pedido, with_for_update=True)
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
-    session.delete(item_pedido)
-    pedido.calcular_preco()
-    session.commit()
+    await session.delete(item_pedido)
+    # Recalcula o total a partir dos itens restantes, sem acumular erro de arredondamento
+    resultado = await session.execute(
+        select(func.coalesce(func.sum(ItemPedido.quantidade * ItemPedido.preco_unitario), 0), func.count(ItemPedido.id))
+        .where(ItemPedido.pedido==pedido.id)
+    )
+    preco_pedido, quantidade_itens = resultado.one()
+    pedido.preco = float(preco_pedido)
+    await session.commit()
     return {
         "mensagem": "Item Removido Com Sucesso",
-        "quantidade_itens_pedido": len(pedido.itens),
-        "pedido": pedido
+        "quantidade_itens_pedido": quantidade_itens,
+        "pedido": PedidoResumoSchema.model_validate(pedido)
     }
 
 @order_router.post("/finalizar/{id_pedido}")
-async def finalizar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def finalizar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Finalizar pedido existente
     
@@ -232,20 +254,20 @@ async def finalizar_pedido(id_pedido: int, session: Session = Depends(pegar_sess
         Requer token JWT válido no header Authorization
         Apenas o dono do pedido ou administradores podem finalizar
     """
-    pedido = session.query(Pedido).filter(Pedido.id==id_pedido).first()
+    pedido = await session.get(Pedido, id_pedido)
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido Não Encontrado")
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
     pedido.status = "FINALIZADO"
-    session.commit()
+    await session.commit()
     return {
         "mensagem": f"Pedido Número: {id_pedido} Finalizado Com Sucesso", 
-        "pedido": pedido
+        "pedido": PedidoResumoSchema.model_validate(pedido)
     }
 
 @order_router.get("/pedido/{id_pedido}")
-async def visualizar_pedido(id_pedido: int, session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def visualizar_pedido(id_pedido: int, session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Visualizar detalhes de um pedido específico
     
@@ -270,18 +292,18 @@ async def visualizar_pedido(id_pedido: int, session: Session = Depends(pegar_ses
         Requer token JWT válido no header Authorization
         Apenas o dono do pedido ou administradores podem visualizar
     """
-    pedido = session.query(Pedido).filter(Pedido.id==id_pedido).first()
+    pedido = await session.get(Pedido, id_pedido, options=[selectinload(Pedido.itens)])
     if not pedido:
         raise HTTPException(status_code=400, detail="Pedido Não Encontrado")
     if not usuario.admin and usuario.id != pedido.usuario:
         raise HTTPException(status_code=401, detail="Você Não Tem Autorização Para Fazer Essa Operação")
     return {
         "quantidade_tens_pedido": len(pedido.itens),
-        "pedido": pedido
+        "pedido": ResponsePedidoDetalhadoSchema.model_validate(pedido)
     }
 
 @order_router.get("/pedidos-usuario", response_model=List[ResponsePedidoSchema])
-async def listar_pedidos_usuario(session: Session = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
+async def listar_pedidos_usuario(session: AsyncSession = Depends(pegar_sessao), usuario: Usuario = Depends(verificar_token)):
     """
     Listar pedidos do usuário autenticado
     
@@ -306,5 +328,6 @@ async def listar_pedidos_usuario(session: Session = Depends(pegar_sessao), usuar
     Note:
         A resposta segue o modelo ResponsePedidoSchema para consistência
     """
-    pedidos = session.query(Pedido).filter(Pedido.usuario==usuario.id).all()
+    resultado = await session.execute(select(Pedido).options(selectinload(Pedido.itens)).where(Pedido.usuario==usuario.id))
+    pedidos = resultado.scalars().all()
     return pedidos
@@ -33,11 +33,41 @@ class ItemPedidoSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class PedidoResumoSchema(BaseModel):
+    id: int
+    status: str
+    preco: float
+    usuario: int
+
+    class Config:
+        from_attributes = True
+
 class ResponsePedidoSchema(BaseModel):
     id: int
     status: str
     preco: float
     itens: List[ItemPedidoSchema]
 
+    class Config:
+        from_attributes = True
+
+class ResponseItemPedidoSchema(BaseModel):
+    id: int
+    quantidade: int
+    sabor: str
+    tamanho: str
+    preco_unitario: float
+    pedido: int
+
+    class Config:
+        from_attributes = True
+
+class ResponsePedidoDetalhadoSchema(BaseModel):
+    id: int
+    status: str
+    preco: float
+    usuario: int
+    itens: List[ResponseItemPedidoSchema]
+
     class Config:
         from_attributes = True
\ No newline at end of file